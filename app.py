@@ -1,813 +1,640 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 import google.generativeai as genai
+import hashlib
 import os
-import json
+import orjson
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from functools import lru_cache
+import re
+import numpy as np
+import diskcache
+from flask_compress import Compress
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from datetime import datetime
 from dotenv import load_dotenv
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
+class OrjsonProvider(DefaultJSONProvider):
+    #orjson behind request.json / jsonify
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+#gzip/br for HTML, CSS, JS and JSON; text/event-stream is not in
+#COMPRESS_MIMETYPES, so SSE deltas are never buffered for compression
+app.config['COMPRESS_MIN_SIZE'] = 500
+
+@app.after_request
+def revalidate_compressed(response):
+    #Registered before Compress, so it runs after it: Flask-Compress rewrites the
+    #ETag to "...:gzip"/"...:br", which the browser then sends back in
+    #If-None-Match, so the 304 check has to be redone against that tag
+    if response.status_code == 200 and 'Content-Encoding' in response.headers and request.if_none_match:
+        response.make_conditional(request)
+    return response
+
+Compress(app)
 
 load_dotenv()
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+_MODEL = genai.GenerativeModel('gemini-2.5-flash')
 
+#Shared storage keeps quotas global across gunicorn workers
 limiter = Limiter(key_func=get_remote_address,
                   app=app,
-                  default_limits=["30 per hour"])
+                  default_limits=["30 per hour"],
+                  storage_uri=os.getenv("REDIS_URL", "memory://"),
+                  strategy="fixed-window")
 
 documents = None
+documents_lower = None
+documents_tokens = None
+#(vocab, term_ptrs, post_docs, post_counts): term-major postings for the numba scorer
+_token_index = None
 doc_embeddings = None
+_doc_matrix = None
+_doc_scale = None
 
 def load_documents():
-    #Load Precomputed Embeddings
-    global documents, doc_embeddings
+    """Load documents and precomputed embeddings.
+
+    _doc_matrix always holds L2-normalized rows, so cosine similarity against
+    a unit query is a plain dot product. The .npy files from build_index.py
+    are normalized on disk; the JSON fallback is normalized here. When the
+    int8 matrix is available, _doc_scale holds the per-row dequantization
+    scale and _doc_matrix holds the int8 rows.
+    """
+    global documents, documents_lower, documents_tokens, _token_index
+    global doc_embeddings, _doc_matrix, _doc_scale
     if documents is None:
         print("Loading documents...")
-        with open("yardstick_docs.json") as f:
-            documents = json.load(f)
+        with open("yardstick_docs.json", "rb") as f:
+            docs = orjson.loads(f.read())
+        documents_lower = [d.lower() for d in docs]
+        documents_tokens = [Counter(tokenize(d)) for d in documents_lower]
+        _token_index = build_token_index(documents_tokens)
+        documents = docs
         try:
-            with open("yardstick_embeddings.json") as f:
-                doc_embeddings = json.load(f)
-            print(f"Loaded {len(documents)} documents with embeddings")
+            #the int8 rows are unusable without their scales, so require both
+            if os.path.exists("yardstick_embeddings_i8.npy") and os.path.exists("yardstick_embeddings_i8_scale.npy"):
+                #int8 rows + per-row scale: 4x less bandwidth while scoring
+                doc_embeddings = np.load("yardstick_embeddings_i8.npy", mmap_mode="r")
+                _doc_scale = np.load("yardstick_embeddings_i8_scale.npy").astype(np.float32, copy=False)
+                _doc_matrix = doc_embeddings
+            elif os.path.exists("yardstick_embeddings.npy"):
+                #float16 matrix built by build_index.py: one binary read instead of a
+                #JSON parse, widened to float32 in memory for scoring
+                doc_embeddings = np.load("yardstick_embeddings.npy").astype(np.float32)
+                _doc_matrix = doc_embeddings
+            else:
+                with open("yardstick_embeddings.json", "rb") as f:
+                    doc_embeddings = np.asarray(orjson.loads(f.read()), dtype=np.float32)
+                #L2-normalize rows once, in place, so scoring is a single matmul
+                norms = np.linalg.norm(doc_embeddings, axis=1, keepdims=True)
+                doc_embeddings /= np.clip(norms, 1e-12, None)
+                _doc_matrix = doc_embeddings
+            if doc_embeddings.shape[0] != len(documents):
+                #rows no longer line up with documents; rebuild with build_index.py --embed
+                print(f"Embeddings have {doc_embeddings.shape[0]} rows for {len(documents)} documents, using keyword search")
+                doc_embeddings = None
+                _doc_matrix = None
+                _doc_scale = None
+            else:
+                print(f"Loaded {len(documents)} documents with embeddings")
         except FileNotFoundError:
             print("No embeddings file found, using keyword search")
             doc_embeddings = None
-        
-def consine_similarity(a,b):
-    #cosine similarity
-    import math
-    dot_product = sum(x*y for x,y in zip(a,b))
-    magnitude_a = math.sqrt(sum(x*x for x in a))
-    magnitude_b = math.sqrt(sum(x*x for x in b))
-    if magnitude_a == 0 or magnitude_b == 0:
-        return 0
-    return dot_product/(magnitude_a*magnitude_b)
+            _doc_matrix = None
+            _doc_scale = None
+
+#Near-duplicate questions reuse a cached answer above this cosine
+SEMANTIC_CACHE_THRESHOLD = 0.97
+SEMANTIC_CACHE_SIZE = 256
+
+#Fixed slots; the least recently used slot is overwritten when full
+_semantic_cache_lock = threading.Lock()
+_semantic_cache_vecs = None
+_semantic_cache_answers = []
+_semantic_cache_last_used = np.zeros(SEMANTIC_CACHE_SIZE, dtype=np.int64)
+_semantic_cache_tick = 0
+
+#embed_ok/embed_fail/embed_timeout count API calls, embed_disk_hit the disk cache,
+#cache_hit/cache_miss the semantic answer cache
+stats = Counter()
+_stats_lock = threading.Lock()
+
+def count(name):
+    with _stats_lock:
+        stats[name] += 1
+
+def normalize_query(text):
+    return " ".join(text.lower().split())
+
+#Must match build_index.py; also namespaces the disk cache keys
+EMBED_MODEL = "models/text-embedding-004"
+
+#Query embeddings persisted across restarts and shared by workers
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "./emb_cache")
+EMBED_CACHE_SIZE_LIMIT = 64 * 1024 * 1024
+
+_emb_cache = None
+_emb_cache_lock = threading.Lock()
+
+def get_emb_cache():
+    #opened lazily so each gunicorn worker gets its own sqlite connection
+    global _emb_cache
+    if _emb_cache is None:
+        with _emb_cache_lock:
+            if _emb_cache is None:
+                try:
+                    _emb_cache = diskcache.Cache(EMBED_CACHE_DIR, size_limit=EMBED_CACHE_SIZE_LIMIT)
+                except Exception:
+                    app.logger.exception("embedding disk cache unavailable")
+                    _emb_cache = False
+    #an empty Cache is falsy, so compare against the failure sentinel
+    return None if _emb_cache is False else _emb_cache
+
+@lru_cache(maxsize=1024)
+def _embed_cached(text):
+    #in-memory layer over the disk cache; raises on API errors so failures are never cached
+    cache = get_emb_cache()
+    key = f"{EMBED_MODEL}:{text}"
+    if cache is not None:
+        try:
+            blob = cache.get(key)
+        except Exception:
+            #a broken disk cache only costs an API call
+            app.logger.exception("embedding disk cache read failed")
+            blob = None
+        if blob is not None:
+            count('embed_disk_hit')
+            #frombuffer over bytes is already read-only
+            return np.frombuffer(blob, dtype=np.float32)
+
+    result = genai.embed_content(
+        model=EMBED_MODEL,
+        content=text,
+        task_type="retrieval_query"
+    )
+    count('embed_ok')
+    #read-only so callers can't corrupt the cached vector
+    emb = np.asarray(result['embedding'], dtype=np.float32)
+    emb.flags.writeable = False
+    if cache is not None:
+        try:
+            cache.set(key, emb.tobytes())
+        except Exception:
+            #still return the embedding we already paid for
+            app.logger.exception("embedding disk cache write failed")
+    return emb
 
 def get_embedding(text):
     #google api
     try:
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text,
-            task_type="retrieval_query"
-        )
-        return result['embedding']
-    except Exception as e:
-        print("Embedding error: {e}")
+        return _embed_cached(normalize_query(text))
+    except Exception:
+        count('embed_fail')
+        app.logger.exception("embedding failed")
         return None
+
+def get_query_vector(text):
+    #unit-length query embedding, or None if embedding failed
+    query_emb = get_embedding(text)
+    if query_emb is None:
+        return None
+    q = np.asarray(query_emb, dtype=np.float32)
+    return q / max(np.linalg.norm(q), 1e-12)
+
+def semantic_cache_lookup(q):
+    global _semantic_cache_tick
+    answer = None
+    with _semantic_cache_lock:
+        n = len(_semantic_cache_answers)
+        if n:
+            sims = _semantic_cache_vecs[:n] @ q
+            best = int(np.argmax(sims))
+            if sims[best] > SEMANTIC_CACHE_THRESHOLD:
+                answer = _semantic_cache_answers[best]
+                _semantic_cache_tick += 1
+                _semantic_cache_last_used[best] = _semantic_cache_tick
+    count('cache_hit' if answer is not None else 'cache_miss')
+    return answer
+
+def semantic_cache_add(q, answer):
+    global _semantic_cache_vecs, _semantic_cache_tick
+    with _semantic_cache_lock:
+        if _semantic_cache_vecs is None:
+            _semantic_cache_vecs = np.zeros((SEMANTIC_CACHE_SIZE, q.shape[0]), dtype=np.float32)
+        n = len(_semantic_cache_answers)
+        if n < SEMANTIC_CACHE_SIZE:
+            slot = n
+            _semantic_cache_answers.append(answer)
+        else:
+            slot = int(np.argmin(_semantic_cache_last_used))
+            _semantic_cache_answers[slot] = answer
+        _semantic_cache_vecs[slot] = q
+        _semantic_cache_tick += 1
+        _semantic_cache_last_used[slot] = _semantic_cache_tick
+
+#Below this many rows the compiled loop is tried first, ahead of simsimd:
+#per-call overhead dominates there and the loop is as fast as the SIMD kernels
+NUMBA_MAX_ROWS = 64
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _batch_dot(doc_mat, q):
+        n, d = doc_mat.shape
+        out = np.empty(n, dtype=np.float64)
+        for i in range(n):
+            acc = 0.0
+            for j in range(d):
+                acc += doc_mat[i, j] * q[j]
+            out[i] = acc
+        return out
+
+    @njit(cache=True)
+    def _score_tokens(term_ptrs, post_docs, post_counts, query_ids, n_docs):
+        #walks only the query terms' postings: O(their total length)
+        out = np.zeros(n_docs, dtype=np.int64)
+        for qid in query_ids:
+            for p in range(term_ptrs[qid], term_ptrs[qid + 1]):
+                out[post_docs[p]] += post_counts[p]
+        return out
+else:
+    _batch_dot = None
+    _score_tokens = None
+
+def _use_numba():
+    return _batch_dot is not None and _doc_matrix.shape[0] < NUMBA_MAX_ROWS
+
+def score_documents(q):
+    #similarity of unit query q against every document row
+    if _doc_scale is None:
+        if _use_numba():
+            return _batch_dot(_doc_matrix, q)
+        if simsimd is not None:
+            #hand-tuned AVX2/AVX-512/NEON cosine kernels
+            return 1 - np.asarray(simsimd.cdist(q[None, :], _doc_matrix, metric='cosine'))[0]
+        return _doc_matrix @ q
+    q_scale = max(float(np.max(np.abs(q))), 1e-12) / 127
+    q_i8 = np.round(q / q_scale).astype(np.int8)
+    if _use_numba():
+        raw = _batch_dot(_doc_matrix, q_i8)
+    elif simsimd is not None:
+        #cosine is scale-invariant per vector, so the int8 rows need no rescale
+        return 1 - np.asarray(simsimd.cdist(q_i8[None, :], _doc_matrix, metric='cosine'))[0]
+    else:
+        raw = np.einsum('ij,j->i', _doc_matrix, q_i8, dtype=np.int32)
+    return raw * (_doc_scale * q_scale)
     
-def semantic_search(query,k=5):
-    #SEARCH using embeddings
-    load_documents()
-    query_emb = get_embedding(query)
-    if query_emb is None or doc_embeddings is None:
-        return keyword_search(query,k)
-    similarity = []
-    for i,doc_emb in enumerate(doc_embeddings):
-        sim = consine_similarity(query_emb,doc_emb)
-        similarity.append((sim,1))
-        
-    similarity.sort(reverse=True)
-    return [documents[i] for _, i in similarity[:k]]
+def rank_documents(q, k=5):
+    #top-k documents for unit query vector q
+    sims = score_documents(q)
+    #O(N) top-k selection, then sort only the winners
+    k_eff = min(k, sims.shape[0])
+    if k_eff <= 0:
+        return []
+    top = np.argpartition(-sims, k_eff-1)[:k_eff]
+    top = top[np.argsort(-sims[top])]
+    return [documents[int(i)] for i in top]
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text_lower):
+    return _TOKEN_RE.findall(text_lower)
+
+def build_token_index(token_counts):
+    #invert per-doc Counters into vocab ids + term-major CSR postings
+    postings = {}
+    for doc, counts in enumerate(token_counts):
+        for tok, n in counts.items():
+            postings.setdefault(tok, []).append((doc, n))
+    vocab = {}
+    term_ptrs = [0]
+    post_docs = []
+    post_counts = []
+    for tok, plist in postings.items():
+        vocab[tok] = len(vocab)
+        for doc, n in plist:
+            post_docs.append(doc)
+            post_counts.append(n)
+        term_ptrs.append(len(post_docs))
+    return (vocab,
+            np.asarray(term_ptrs, dtype=np.int32),
+            np.asarray(post_docs, dtype=np.int32),
+            np.asarray(post_counts, dtype=np.int32))
 
 def keyword_search(query, k=10):
     load_documents()
-    keywords = query.lower().split()
-    scored = []
-    
-    for i,doc in enumerate(documents):
-        doc_lower = doc.lower()
-        score = sum(doc_lower.count(kw) for kw in keywords)
-        if query.lower() in doc_lower:
-            score += 100
-        if score > 0:
-            scored.append((score,i))
-    
-    scored.sort(reverse=True)
-    return [documents[i] for _, i in scored[:k]]
-
+    q_lower = query.lower()
+    keywords = tokenize(q_lower)
+    if not keywords or not documents:
+        return []
+
+    #token counts were built at load time, so scoring never rescans text
+    if _score_tokens is not None:
+        vocab, term_ptrs, post_docs, post_counts = _token_index
+        query_ids = np.asarray([vocab[kw] for kw in keywords if kw in vocab], dtype=np.int32)
+        scores = _score_tokens(term_ptrs, post_docs, post_counts, query_ids, len(documents))
+    else:
+        scores = np.zeros(len(documents), dtype=np.int64)
+        for i,counts in enumerate(documents_tokens):
+            scores[i] = sum(counts.get(kw, 0) for kw in keywords)
+    for i,doc_lower in enumerate(documents_lower):
+        if q_lower in doc_lower:
+            scores[i] += 100
+
+    k_eff = min(k, scores.shape[0])
+    if k_eff <= 0:
+        return []
+    top = np.argpartition(-scores, k_eff-1)[:k_eff]
+    top = top[np.argsort(-scores[top])]
+    return [documents[int(i)] for i in top if scores[i] > 0]
+
+
+NO_INFO_ANSWER = "I don't have information about that. Please ask about doctors, facilities, or hospital services."
+ERROR_ANSWER = "I'm having trouble processing your request. Please try again in a moment."
+
+#Exact-match answers keyed by normalize_query(question), least recently used first
+ANSWER_CACHE_SIZE = 256
+response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+def cached_answer(key, touch=True):
+    with _response_cache_lock:
+        answer = response_cache.get(key)
+        if answer is not None and touch:
+            response_cache.move_to_end(key)
+    return answer
+
+def store_answer(key, answer):
+    with _response_cache_lock:
+        response_cache[key] = answer
+        response_cache.move_to_end(key)
+        if len(response_cache) > ANSWER_CACHE_SIZE:
+            response_cache.popitem(last=False)
+
+def is_cached_request():
+    #lets exact repeats skip the rate limit; they cost no Gemini calls
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return False
+    question = data.get('question')
+    if not isinstance(question, str):
+        return False
+    return cached_answer(normalize_query(question), touch=False) is not None
+
+#Both chat endpoints draw from one per-client budget of Gemini generations
+chat_limit = limiter.shared_limit("10 per minute", scope="chat", exempt_when=is_cached_request)
 
 def generate_answer(query):
     """Generate answer using semantic search + Gemini"""
-    # Use semantic search if embeddings available, else keyword
-    if doc_embeddings:
-        relevant_docs = semantic_search(query, k=5)
-    else:
-        relevant_docs = keyword_search(query, k=10)
-    
-    if not relevant_docs:
-        return "I don't have information about that. Please ask about doctors, facilities, or hospital services."
-    
-    context = '\n\n'.join(relevant_docs)
-    
-    prompt = f"""Yardstick AI assistant: helpful, professional, concise.
+    key = normalize_query(query)
+    answer = cached_answer(key)
+    if answer is not None:
+        return answer
+    try:
+        return _generate(key)
+    except Exception:
+        app.logger.exception("gemini failed")
+        return ERROR_ANSWER
+
+def _generate(query):
+    #query is already normalized; Gemini errors propagate so they are never cached
+    q, keyword_docs = retrieve(query)
+    if q is not None:
+        cached = semantic_cache_lookup(q)
+        if cached is not None:
+            store_answer(query, cached)
+            return cached
+
+    prompt = build_prompt(query, q, keyword_docs)
+    if prompt is None:
+        return NO_INFO_ANSWER
+
+    response = _MODEL.generate_content(prompt)
+    answer = response.text.strip()
+    remember_answer(query, q, answer)
+    return answer
+
+def remember_answer(query, q, answer):
+    #Only answers retrieved with a real query vector are reused; keyword-only
+    #fallbacks (embedding failed or timed out) are regenerated next time
+    if q is None or not answer:
+        return
+    store_answer(query, answer)
+    semantic_cache_add(q, answer)
+
+def stream_answer(query):
+    """Yield answer text chunks as Gemini produces them.
+
+    Gemini errors propagate, possibly after some chunks were already yielded;
+    chat_stream turns them into a separate error event.
+    """
+    query = normalize_query(query)
+    cached = cached_answer(query)
+    if cached is not None:
+        yield cached
+        return
+    q, keyword_docs = retrieve(query)
+    if q is not None:
+        cached = semantic_cache_lookup(q)
+        if cached is not None:
+            store_answer(query, cached)
+            yield cached
+            return
+
+    prompt = build_prompt(query, q, keyword_docs)
+    if prompt is None:
+        yield NO_INFO_ANSWER
+        return
+
+    parts = []
+    for chunk in _MODEL.generate_content(prompt, stream=True):
+        parts.append(chunk.text)
+        yield chunk.text
+    remember_answer(query, q, ''.join(parts).strip())
+
+#Cap on retrieved text sent to Gemini; prefill cost scales with it
+CONTEXT_CHAR_BUDGET = 6000
+
+_PROMPT_TMPL = """Yardstick AI assistant: helpful, professional, concise.
 
 Answer from context (2-3 sentences, benefit-focused). If missing info: acknowledge + offer free strategy call. Pricing: "Depends on needs - what's your use case?" Technical: redirect to team. Contact: contact@yardstick.live | +917891053001
 
 Never fabricate. Stay positive.
 {context}
 
-User QUESTION: {query}
+User QUESTION: {question}
 
 YOUR ANSWER:"""
+
+def build_context(docs, budget=CONTEXT_CHAR_BUDGET):
+    #join docs in rank order, truncating the last one at the budget
+    parts = []
+    used = 0
+    for doc in docs:
+        remaining = budget - used
+        if remaining <= 0:
+            break
+        part = doc[:remaining]
+        parts.append(part)
+        used += len(part) + 2
+    return '\n\n'.join(parts)
+
+#Give up on the embedding call after this long and answer from keywords
+EMBED_TIMEOUT = 3.0
+
+#Threads start lazily on first submit, i.e. inside gunicorn workers
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="embed")
+
+def retrieve(query):
+    """Return (unit query vector or None, keyword candidates).
+
+    The embedding request is started first and the keyword candidates are
+    scored while it is in flight, so a slow or failed embedding call costs
+    at most EMBED_TIMEOUT before falling back to keyword results.
+    """
+    load_documents()
+    future = _executor.submit(get_query_vector, query)
+    keyword_docs = keyword_search(query, k=10)
+    try:
+        q = future.result(timeout=EMBED_TIMEOUT)
+    except FuturesTimeout:
+        #the call keeps running and still fills the embedding cache
+        count('embed_timeout')
+        app.logger.warning("embedding timed out after %.1fs", EMBED_TIMEOUT)
+        q = None
+    return q, keyword_docs
+
+def build_prompt(query, q, keyword_docs):
+    #prompt for query; None when nothing relevant was found
+    # Use semantic search if embeddings available, else keyword
+    if q is not None and doc_embeddings is not None:
+        relevant_docs = rank_documents(q, k=5)
+    else:
+        relevant_docs = keyword_docs
+    
+    if not relevant_docs:
+        return None
     
+    context = build_context(relevant_docs)
+    return _PROMPT_TMPL.format(context=context, question=query)
+
+def prewarm():
+    #Pay the cold-start costs at boot instead of on the first request
+    load_documents()
+    if _doc_matrix is not None:
+        #compile (or load the cached) numba kernels before serving
+        score_documents(np.zeros(_doc_matrix.shape[1], dtype=np.float32))
+    keyword_search("warmup")
+    #gunicorn preloads this module in the master before forking; the gRPC
+    #channel is opened per worker by post_worker_init in gunicorn.conf.py
+    if "gunicorn" not in os.environ.get("SERVER_SOFTWARE", ""):
+        warm_gemini()
+
+def warm_gemini():
+    #Throwaway embedding call to open the Gemini gRPC channel
+    if not os.getenv("GEMINI_API_KEY"):
+        return
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        response = model.generate_content(prompt)
-        return response.text.strip()
-    except Exception as e:
-        print(f"❌ Gemini error: {e}")
-        return "I'm having trouble processing your request. Please try again in a moment."
+        genai.embed_content(
+            model=EMBED_MODEL,
+            content="warmup",
+            task_type="retrieval_query"
+        )
+    except Exception:
+        app.logger.exception("warmup embedding failed")
+
+prewarm()
+
+@app.after_request
+def add_cache_headers(response):
+    #The chat page revalidates by ETag on every load. Its stylesheet link carries
+    #a content hash (render_index), so that exact URL never changes content and can be
+    #kept for good; other static assets keep an hour.
+    if request.path == '/':
+        response.headers['Cache-Control'] = 'no-cache'
+    elif request.path.startswith('/static/'):
+        #only the current hash: a stale ?v= must not pin new content for a year
+        if request.path == '/static/app.css' and request.args.get('v') == _CSS_VERSION:
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+_PONG = b'pong'
+#(second, body) of the last /health payload; rebuilt at most once a second
+_health_cache = (None, None)
 
 @app.route('/health')
+@limiter.exempt
 def health():
-    return jsonify({
-        'status': 'alive',
-        'docs_loaded': documents is not None,
-        'embeddings_loaded': doc_embeddings is not None,
-        'timestamp': datetime.now().isoformat()
-    }), 200
+    global _health_cache
+    second = int(time.time())
+    cached_second, body = _health_cache
+    if cached_second != second:
+        body = orjson.dumps({
+            'status': 'alive',
+            'docs_loaded': documents is not None,
+            'embeddings_loaded': doc_embeddings is not None,
+            'stats': dict(stats),
+            'embedding_cache': _embed_cached.cache_info()._asdict(),
+            'answer_cache': {'currsize': len(response_cache), 'maxsize': ANSWER_CACHE_SIZE},
+            'timestamp': datetime.now().isoformat()
+        })
+        _health_cache = (second, body)
+    return Response(body, status=200, mimetype='application/json')
 
 @app.route('/ping')
+@limiter.exempt
 def ping():
-    return 'pong', 200
+    return _PONG, 200
+
+def static_version(filename):
+    with open(os.path.join(app.static_folder, filename), 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+def render_index(css_version):
+    #stamp the stylesheet URL with its content hash, so new HTML always
+    #fetches the matching app.css instead of a cached older copy
+    with open(os.path.join(app.static_folder, 'index.html'), 'rb') as f:
+        html = f.read()
+    return html.replace(b'href="static/app.css"',
+                        b'href="static/app.css?v=' + css_version.encode() + b'"')
+
+#Static files only change with a deploy, which restarts the app
+_CSS_VERSION = static_version('app.css')
+_INDEX_HTML = render_index(_CSS_VERSION)
+_INDEX_ETAG = hashlib.sha1(_INDEX_HTML).hexdigest()
 
 @app.route('/')
 def home():
-    html_content = '''
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Yardstick - AI Assistant</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-
-        :root {
-            --purple-dark: #22044D;
-            --purple-mid: #720ABC;
-            --purple-accent: #580063;
-            --pink-muted: #47203C;
-            --pink-bright: #EA2BAE;
-            --bg-dark: #000000;
-            --bar-color: #1C151D;
-            --text-white: #FFFFFF;
-            --text-gray: #B8B8B8;
-            --shadow: rgba(71, 32, 60, 0.3);
-        }
-
-        body {
-            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
-            background: radial-gradient(circle at top right, var(--purple-accent) 0%, var(--bg-dark) 40%, var(--bg-dark) 100%);
-            min-height: 100vh;
-            display: flex;
-            flex-direction: column;
-        }
-
-        /* Splash Screen */
-        #splashScreen {
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: gradient(#000000 0%, var(--bg-dark) 60%);
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-            justify-content: center;
-            z-index: 9999;
-            animation: fadeOut 1.5s ease 3.5s forwards;
-        }
-
-        @keyframes fadeOut {
-            to {
-                opacity: 0;
-                visibility: hidden;
-            }
-        }
-
-        .splash-logo {
-            width: 150px;
-            height: 150px;
-            margin-bottom: 30px;
-            opacity: 0;
-            transform: scale(0.3);
-            animation: logoPopIn 0.8s cubic-bezier(0.68, -0.55, 0.265, 1.55) 0.3s forwards;
-        }
-
-        @keyframes logoPopIn {
-            0% {
-                opacity: 0;
-                transform: scale(0.3) rotate(0deg);
-            }
-            100% {
-                opacity: 1;
-                transform: scale(1) rotate(0deg);
-            }
-        }
-
-        .splash-text {
-            font-size: 3rem;
-            font-weight: 350;
-            color: var(--text-white);
-            overflow: hidden;
-            position: relative;
-        }
-
-        .splash-text span {
-            display: inline-block;
-            opacity: 0;
-            transform: translateX(-100px);
-            animation: slideInText 0.3s ease forwards;
-        }
-
-        .splash-text span:nth-child(1) { animation-delay: 1s; }
-        .splash-text span:nth-child(2) { animation-delay: 1.1s; }
-        .splash-text span:nth-child(3) { animation-delay: 1.2s; }
-        .splash-text span:nth-child(4) { animation-delay: 1.3s; }
-        .splash-text span:nth-child(5) { animation-delay: 1.4s; }
-        .splash-text span:nth-child(6) { animation-delay: 1.5s; }
-        .splash-text span:nth-child(7) { animation-delay: 1.6s; }
-        .splash-text span:nth-child(8) { animation-delay: 1.7s; }
-        .splash-text span:nth-child(9) { animation-delay: 1.8s; }
-
-        @keyframes slideInText {
-            to {
-                opacity: 1;
-                transform: translateX(0);
-            }
-        }
-
-        .splash-tagline {
-            margin-top: 15px;
-            font-size: 1rem;
-            color: var(--text-gray);
-            opacity: 0;
-            animation: fadeIn 0.5s ease 2s forwards;
-        }
-
-        @keyframes fadeIn {
-            to {
-                opacity: 1;
-            }
-        }
-
-        /* Hide main content initially */
-        #mainApp {
-            opacity: 0;
-            animation: showApp 0.5s ease 2.8s forwards;
-        }
-
-        @keyframes showApp {
-            to {
-                opacity: 1;
-            }
-        }
-
-        /* Rest of your existing styles */
-        .chat-header {
-            background: var(--bar-color);
-            color: var(--text-white);
-            padding: 15px 20px;
-            display: flex;
-            align-items: center;
-            gap: 12px;
-            box-shadow: 0 2px 10px rgba(0, 0, 0, 0.5);
-            border-bottom: 1px solid rgba(88, 0, 99, 0.3);
-            position: fixed;
-            top: 0;
-            left: 0;
-            right: 0;
-            z-index: 100;
-        }
-
-        .logo-container {
-            width: 40px;
-            height: 40px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            flex-shrink: 0;
-        }
-
-        .logo-container img {
-            width: 100%;
-            height: 100%;
-            object-fit: contain;
-        }
-
-        .header-text h1 {
-            font-size: 1.3rem;
-            font-weight: 400;
-            color: var(--text-white);
-        }
-
-        .chat-messages {
-            flex: 1;
-            overflow-y: auto;
-            padding: 80px 20px 120px 20px;
-            background: var(--bg-dark);
-            min-height: 500px;
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-        }
-
-        .messages-container {
-            width: 100%;
-            max-width: 700px;
-        }
-
-        .message {
-            display: flex;
-            margin-bottom: 20px;
-            animation: slideIn 0.3s ease;
-            width: 100%;
-        }
-
-        @keyframes slideIn {
-            from {
-                opacity: 0;
-                transform: translateY(10px);
-            }
-            to {
-                opacity: 1;
-                transform: translateY(0);
-            }
-        }
-
-        .message.user {
-            justify-content: flex-end;
-        }
-
-        .message.bot {
-            justify-content: flex-start;
-        }
-
-        .message-content {
-            display: flex;
-            align-items: flex-start;
-            gap: 12px;
-            max-width: 85%;
-        }
-
-        .message.user .message-content {
-            flex-direction: row-reverse;
-        }
-
-        .message-icon {
-            width: 35px;
-            height: 35px;
-            border-radius: 50%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 1.2rem;
-            flex-shrink: 0;
-            margin-top: 2px;
-            overflow: hidden;
-        }
-
-        .message.bot .message-icon {
-            background: #000000;
-            padding: 5px;
-        }
-
-        .message.user .message-icon {
-            background: rgba(88, 0, 99, 0.6);
-        }
-
-        .message-icon img {
-            width: 100%;
-            height: 100%;
-            object-fit: contain;
-            border-radius: 8px;
-        }
-
-        .message-bubble {
-            padding: 12px 18px;
-            border-radius: 18px;
-            font-size: 0.95rem;
-            line-height: 1.6;
-            word-wrap: break-word;
-            display: inline-block;
-            max-width: 100%;
-        }
-
-        .message.bot .message-bubble {
-            background: var(--bar-color);
-            color: var(--text-white);
-            border: 1px solid rgba(88, 0, 99, 0.4);
-            border-radius: 18px 18px 18px 4px;
-        }
-
-        .message.user .message-bubble {
-            background: #000000;
-            color: var(--text-white);
-            border-radius: 18px 18px 4px 18px;
-        }
-
-        .typing-indicator {
-            display: none;
-            align-items: center;
-            gap: 12px;
-            width: 100%;
-            max-width: 800px;
-            padding: 0 20px;
-            margin: 0 auto;
-        }
-
-        .typing-indicator.active {
-            display: flex;
-        }
-
-        .typing-indicator-icon {
-            width: 35px;
-            height: 35px;
-            border-radius: 50%;
-            background: linear-gradient(135deg, var(--pink-muted) 0%, var(--purple-mid) 100%);
-            flex-shrink: 0;
-        }
-
-        .typing-dots {
-            display: flex;
-            align-items: center;
-            padding: 12px 18px;
-            background: var(--bar-color);
-            border: 1px solid rgba(88, 0, 99, 0.4);
-            border-radius: 18px;
-        }
-
-        .typing-dot {
-            width: 8px;
-            height: 8px;
-            margin: 0 3px;
-            background: var(--pink-muted);
-            border-radius: 50%;
-            animation: typing 1.4s infinite;
-        }
-
-        .typing-dot:nth-child(2) {
-            animation-delay: 0.2s;
-        }
-
-        .typing-dot:nth-child(3) {
-            animation-delay: 0.4s;
-        }
-
-        @keyframes typing {
-            0%, 60%, 100% {
-                transform: translateY(0);
-            }
-            30% {
-                transform: translateY(-8px);
-            }
-        }
-
-        .chat-input-area {
-            position: fixed;
-            bottom: 0;
-            left: 0;
-            right: 0;
-            padding: 20px;
-            background: linear-gradient(to top, var(--bg-dark) 80%, transparent);
-            z-index: 100;
-        }
-
-        .chat-input-wrapper {
-            max-width: 600px;
-            margin: 0 auto;
-        }
-
-        .chat-input-container {
-            display: flex;
-            gap: 10px;
-            background: var(--bar-color);
-            padding: 8px;
-            border-radius: 30px;
-            border: 1px solid rgba(88, 0, 99, 0.5);
-            box-shadow: 0 4px 20px rgba(0, 0, 0, 0.6);
-        }
-
-        #userInput {
-            flex: 1;
-            padding: 12px 18px;
-            border: none;
-            border-radius: 25px;
-            font-size: 0.95rem;
-            outline: none;
-            background: rgba(0, 0, 0, 0.5);
-            color: var(--text-white);
-            min-width: 200px;
-        }
-
-        #userInput::placeholder {
-            color: var(--text-gray);
-        }
-
-        #userInput:focus {
-            background: rgba(0, 0, 0, 0.7);
-        }
-
-        #sendBtn {
-            padding: 12px 24px;
-            background: linear-gradient(45deg, #EA2BAE 0%, #720ABC 50%, #22044D 100%);
-            color: var(--text-white);
-            border: none;
-            border-radius: 25px;
-            font-size: 0.95rem;
-            font-weight: 500;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            white-space: nowrap;
-        }
-
-        #sendBtn:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 4px 15px var(--shadow);
-        }
-
-        #sendBtn:active {
-            transform: translateY(0);
-        }
-
-        #sendBtn:disabled {
-            opacity: 0.6;
-            cursor: not-allowed;
-        }
-
-        .chat-messages::-webkit-scrollbar {
-            width: 8px;
-        }
-
-        .chat-messages::-webkit-scrollbar-track {
-            background: var(--bg-dark);
-        }
-
-        .chat-messages::-webkit-scrollbar-thumb {
-            background: var(--purple-mid);
-            border-radius: 10px;
-        }
-
-        .message-bubble a {
-            color: var(--pink-bright);
-            text-decoration: underline;
-        }
-
-        .message-bubble a:hover {
-            color: var(--pink-muted);
-        }
-
-        @media (max-width: 768px) {
-            .splash-logo {
-                width: 120px;
-                height: 120px;
-            }
-
-            .splash-text {
-                font-size: 2.5rem;
-            }
-
-            .chat-header {
-                padding: 12px 15px;
-            }
-
-            .logo-container {
-                width: 35px;
-                height: 35px;
-            }
-
-            .header-text h1 {
-                font-size: 1.1rem;
-            }
-
-            .chat-messages {
-                padding: 70px 15px 110px 15px;
-            }
-
-            .message-content {
-                max-width: 90%;
-            }
-
-            .message-bubble {
-                font-size: 0.9rem;
-            }
-
-            .message-icon {
-                width: 30px;
-                height: 30px;
-            }
-
-            .chat-input-area {
-                padding: 15px;
-            }
-
-            #sendBtn {
-                padding: 10px 18px;
-                font-size: 0.9rem;
-            }
-        }
-
-        @media (max-width: 480px) {
-            .splash-logo {
-                width: 100px;
-                height: 100px;
-            }
-
-            .splash-text {
-                font-size: 3rem;
-            }
-
-            .header-text h1 {
-                font-size: 1rem;
-            }
-
-            .chat-messages {
-                padding: 65px 10px 100px 10px;
-            }
-
-            .message-content {
-                max-width: 95%;
-            }
-
-            #userInput {
-                font-size: 0.9rem;
-                padding: 10px 15px;
-            }
-        }
-    </style>
-</head>
-<body>
-    <!-- Splash Screen -->
-    <div id="splashScreen">
-        <img src="static/yardstick.png" alt="Yardstick Logo" class="splash-logo">
-        <div class="splash-text">
-            <span>Y</span><span>a</span><span>r</span><span>d</span><span>s</span><span>t</span><span>i</span><span>c</span><span>k</span>
-        </div>
-        <div class="splash-tagline">RAG bot system</div>
-    </div>
-
-    <!-- Main App -->
-    <div id="mainApp">
-        <div class="chat-header">
-            <div class="logo-container">
-                <img src="static/yardstick.png" alt="Yardstick Logo">
-            </div>
-            <div class="header-text">
-                <h1>Yardstick</h1>
-            </div>
-        </div>
-
-        <div class="chat-messages" id="chatMessages">
-            <div class="messages-container" id="messagesContainer">
-                <div class="message bot">
-                    <div class="message-content">
-                        <div class="message-icon"><img src="static/yardstick.png" alt="Yardstick Logo"></div>
-                        <div class="message-bubble">
-                            Hello! Welcome to Yardstick. How can I assist you today?
-                        </div>
-                    </div>
-                </div>
-            </div>
-
-            <div class="typing-indicator" id="typingIndicator">
-                <div class="typing-indicator-icon"></div>
-                <div class="typing-dots">
-                    <div class="typing-dot"></div>
-                    <div class="typing-dot"></div>
-                    <div class="typing-dot"></div>
-                </div>
-            </div>
-        </div>
-
-        <div class="chat-input-area">
-            <div class="chat-input-wrapper">
-                <div class="chat-input-container">
-                    <input 
-                        type="text" 
-                        id="userInput" 
-                        placeholder="Ask anything about Yardstick's AI services"
-                        autocomplete="off"
-                    >
-                    <button id="sendBtn">Send</button>
-                </div>
-            </div>
-        </div>
-    </div>
-
-    <script>
-        const chatMessages = document.getElementById('chatMessages');
-        const messagesContainer = document.getElementById('messagesContainer');
-        const userInput = document.getElementById('userInput');
-        const sendBtn = document.getElementById('sendBtn');
-        const typingIndicator = document.getElementById('typingIndicator');
-
-        // Remove splash screen after animation
-        setTimeout(() => {
-            document.getElementById('splashScreen').style.display = 'none';
-        }, 3000);
-
-        function addMessage(text, isUser = false) {
-            const messageDiv = document.createElement('div');
-            messageDiv.className = `message ${isUser ? 'user' : 'bot'}`;
-            
-            const contentDiv = document.createElement('div');
-            contentDiv.className = 'message-content';
-            
-            const icon = document.createElement('div');
-            icon.className = 'message-icon';
-            if (isUser) {
-                icon.textContent = '👤';
-            } else {
-                const logoImg = document.createElement('img');
-                logoImg.src = 'static/yardstick.png';
-                logoImg.alt = 'Yardstick';
-                icon.appendChild(logoImg);
-            }
-            
-            const bubble = document.createElement('div');
-            bubble.className = 'message-bubble';
-            
-            const urlRegex = /(https?:\/\/[^\s]+)/g;
-            const linkedText = text.replace(urlRegex, (url) => {
-                return `<a href="${url}" target="_blank" rel="noopener noreferrer">${url}</a>`;
-            });
-            
-            bubble.innerHTML = linkedText;
-            
-            contentDiv.appendChild(icon);
-            contentDiv.appendChild(bubble);
-            messageDiv.appendChild(contentDiv);
-            
-            messagesContainer.appendChild(messageDiv);
-            chatMessages.scrollTop = chatMessages.scrollHeight;
-        }
-
-        function showTyping(show) {
-            typingIndicator.classList.toggle('active', show);
-            if (show) {
-                chatMessages.scrollTop = chatMessages.scrollHeight;
-            }
-        }
-
-        async function sendMessage() {
-            const message = userInput.value.trim();
-            if (!message) return;
-
-            addMessage(message, true);
-            userInput.value = '';
-            sendBtn.disabled = true;
-            showTyping(true);
-
-            try {
-                const response = await fetch('/api/chat', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({ question: message })
-                });
-
-                const data = await response.json();
-                showTyping(false);
-                addMessage(data.answer, false);
-
-            } catch (error) {
-                showTyping(false);
-                addMessage("Sorry, I'm having trouble connecting. Please try again.", false);
-            }
-
-            sendBtn.disabled = false;
-            userInput.focus();
-        }
-
-        sendBtn.addEventListener('click', sendMessage);
-        userInput.addEventListener('keypress', (e) => {
-            if (e.key === 'Enter') {
-                sendMessage();
-            }
-        });
-
-        // Focus input after splash screen
-        setTimeout(() => {
-            userInput.focus();
-        }, 5000);
-    </script>
-
-</body>
-</html>
-    '''
-    return render_template_string(html_content)
+    response = Response(_INDEX_HTML, mimetype='text/html')
+    response.set_etag(_INDEX_ETAG)
+    return response.make_conditional(request)
 
 @app.route('/api/chat', methods=['POST'])
-@limiter.limit("10 per minute")
+@chat_limit
 def chat():
     try:
         data = request.json
@@ -818,6 +645,11 @@ def chat():
         if not question:
             return jsonify({'error': 'No question provided'}), 400
         
+        #repeated questions return straight from the answer cache
+        answer = cached_answer(normalize_query(question))
+        if answer is not None:
+            return jsonify({'answer': answer}), 200
+
         print(f"📥 Question: {question}")
         answer = generate_answer(question)
         print(f"📤 Answer: {answer[:100]}...")
@@ -830,7 +662,36 @@ def chat():
         traceback.print_exc()
         return jsonify({'error': 'Server error. Please try again.'}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+@chat_limit
+def chat_stream():
+    #Server-sent events: one {"delta": ...} per Gemini chunk, then {"done": true};
+    #a failure mid-answer sends {"error": ...} so the client drops the partial text
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data, dict):
+        return jsonify({'error': 'Invalid request'}), 400
+
+    question = data.get('question', '')
+    if not isinstance(question, str) or not question.strip():
+        return jsonify({'error': 'No question provided'}), 400
+    question = question.strip()
+
+    print(f"📥 Question (stream): {question}")
+
+    def generate():
+        try:
+            for delta in stream_answer(question):
+                yield b"data: " + orjson.dumps({'delta': delta}) + b"\n\n"
+        except Exception:
+            app.logger.exception("gemini failed")
+            yield b"data: " + orjson.dumps({'error': ERROR_ANSWER}) + b"\n\n"
+        yield b"data: " + orjson.dumps({'done': True}) + b"\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 if __name__ == '__main__':
+    #Local development only; production runs under gunicorn (see gunicorn.conf.py)
     port = int(os.environ.get("PORT", 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
 
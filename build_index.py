@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import numpy as np
+
+#Offline: build the embedding files that app.py loads at startup
+DOCS_JSON = "yardstick_docs.json"
+EMBEDDINGS_JSON = "yardstick_embeddings.json"
+EMBEDDINGS_NPY = "yardstick_embeddings.npy"
+EMBEDDINGS_I8_NPY = "yardstick_embeddings_i8.npy"
+EMBEDDINGS_I8_SCALE_NPY = "yardstick_embeddings_i8_scale.npy"
+
+EMBED_MODEL = "models/text-embedding-004"
+#batchEmbedContents accepts at most 100 requests per call
+EMBED_BATCH_SIZE = 100
+
+def embed_documents():
+    #Re-embed every document, one API round-trip per batch
+    import google.generativeai as genai
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+
+    with open(DOCS_JSON) as f:
+        documents = json.load(f)
+
+    embeddings = []
+    for start in range(0, len(documents), EMBED_BATCH_SIZE):
+        batch = documents[start:start + EMBED_BATCH_SIZE]
+        result = genai.embed_content(
+            model=EMBED_MODEL,
+            content=batch,
+            task_type="retrieval_document"
+        )
+        embeddings.extend(result['embedding'])
+        print(f"Embedded {len(embeddings)}/{len(documents)} documents")
+
+    with open(EMBEDDINGS_JSON, "w") as f:
+        json.dump(embeddings, f)
+    save_index(np.asarray(embeddings, dtype=np.float32))
+
+def convert_embeddings():
+    with open(EMBEDDINGS_JSON) as f:
+        emb = np.asarray(json.load(f), dtype=np.float32)
+    with open(DOCS_JSON) as f:
+        num_docs = len(json.load(f))
+    if emb.shape[0] != num_docs:
+        #app.py refuses mismatched files, so don't write them
+        raise SystemExit(f"{EMBEDDINGS_JSON} has {emb.shape[0]} rows for {num_docs} documents; run with --embed")
+    save_index(emb)
+
+def save_index(emb):
+    #Store unit vectors so the app scores with a plain dot product
+    emb /= np.clip(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12, None)
+    np.save(EMBEDDINGS_NPY, emb.astype(np.float16))
+    print(f"Saved {emb.shape[0]} x {emb.shape[1]} embeddings to {EMBEDDINGS_NPY}")
+    quantize_embeddings(emb)
+
+def quantize_embeddings(emb):
+    #Symmetric int8 with one scale per row
+    scale = np.clip(np.max(np.abs(emb), axis=1), 1e-12, None) / 127
+    q_emb = np.round(emb / scale[:, None]).astype(np.int8)
+    np.save(EMBEDDINGS_I8_NPY, q_emb)
+    np.save(EMBEDDINGS_I8_SCALE_NPY, scale.astype(np.float32))
+    print(f"Saved int8 embeddings to {EMBEDDINGS_I8_NPY}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build Yardstick embedding files")
+    parser.add_argument("--embed", action="store_true",
+                        help="re-embed yardstick_docs.json via the Gemini API instead of converting the existing JSON")
+    args = parser.parse_args()
+    if args.embed:
+        embed_documents()
+    else:
+        convert_embeddings()
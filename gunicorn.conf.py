@@ -0,0 +1,19 @@
+import os
+
+#Production server: `gunicorn app:app` picks this file up automatically
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 2))
+#Requests mostly wait on Gemini, so threads overlap that I/O
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+#Leave room for slow generations and streamed answers
+timeout = 120
+
+#Load documents and embeddings once in the master so every worker shares
+#them copy-on-write; the int8 matrix is additionally a read-only mmap.
+preload_app = True
+
+def post_worker_init(worker):
+    #gRPC channels are not fork-safe, so each worker opens its own
+    import app
+    app.warm_gemini()